@@ -6,7 +6,7 @@ is designed to replicate the continuous transform. That is, the transform is vol
 Fourier conventions.
 
 The actual FFT backend is provided by ``pyFFTW`` if it is installed, which provides a significant speedup, and
-multi-threading.
+multi-threading. In this case, FFTW plans are cached, so that repeated transforms of the same shape are not re-planned.
 
 Conveniently, we allow for arbitrary Fourier convention, according to the scheme in
 http://mathworld.wolfram.com/FourierTransform.html. That is, we define the forward and inverse *n*-dimensional
@@ -26,7 +26,7 @@ one must be careful that the frequencies returned are descending, rather than as
 """
 import warnings
 
-__all__ = ['fft', 'ifft', 'fftfreq', 'fftshift', 'ifftshift']
+__all__ = ['fft', 'ifft', 'rfft', 'fftfreq', 'rfftfreq', 'fftshift', 'ifftshift']
 
 # Try importing the pyFFTW interface
 try:
@@ -34,10 +34,15 @@ try:
     from multiprocessing import cpu_count
     THREADS = cpu_count()
 
-    from pyfftw.interfaces.numpy_fft import fftn as _fftn, ifftn as _ifftn, ifftshift as _ifftshift, fftshift as _fftshift, fftfreq as _fftfreq
+    from pyfftw.interfaces.numpy_fft import fftn as _fftn, ifftn as _ifftn, rfftn as _rfftn, ifftshift as _ifftshift, fftshift as _fftshift, fftfreq as _fftfreq, rfftfreq as _rfftfreq
     from pyfftw.interfaces.cache import enable, set_keepalive_time
-#    enable()
-#    set_keepalive_time(100.)
+
+    # Keep FFTW plans (and their aligned buffers) alive between calls, so that repeated transforms of the same shape
+    # (eg. measuring the power of many boxes) are not re-planned each time. Idle plans are released after
+    # KEEPALIVE seconds. Caching can be switched off with ``pyfftw.interfaces.cache.disable()``.
+    KEEPALIVE = 10.
+    enable()
+    set_keepalive_time(KEEPALIVE)
 
     def fftn(*args,**kwargs):
         return _fftn(threads=THREADS,*args,**kwargs)
@@ -45,12 +50,15 @@ try:
     def ifftn(*args, **kwargs):
         return _ifftn(threads=THREADS,*args, **kwargs)
 
+    def rfftn(*args, **kwargs):
+        return _rfftn(threads=THREADS, *args, **kwargs)
+
     HAVE_FFTW = True
 
 except ImportError:
     warnings.warn("You do not have pyFFTW installed. Installing it should give some speed increase.")
     HAVE_FFTW = False
-    from numpy.fft import fftn, ifftn, ifftshift as _ifftshift, fftshift as _fftshift, fftfreq as _fftfreq
+    from numpy.fft import fftn, ifftn, rfftn, ifftshift as _ifftshift, fftshift as _fftshift, fftfreq as _fftfreq, rfftfreq as _rfftfreq
 
 # To avoid MKL-related bugs, numpy needs to be imported after pyfftw: see https://github.com/pyFFTW/pyFFTW/issues/40
 import numpy as np
@@ -109,6 +117,31 @@ def fft(X, L=None, Lk=None, a=0, b=2*np.pi, axes=None, ret_cubegrid=False):
     """
 
 
+    axes, N, L = _forward_setup(X, L, Lk, b, axes)
+
+    V = float(np.prod(L))    # Volume of box
+    Vx = V/np.prod(N) # Volume of cell
+
+    # Apply the (scalar) normalisation in-place, rather than forming a new grid for each factor.
+    ft = fftshift(fftn(X, axes=axes),axes=axes)
+    ft *= Vx*np.sqrt(np.abs(b)/(2*np.pi) ** (1 - a)) ** len(axes)
+
+    dx = np.array([float(l)/float(n) for l, n in zip(L, N)])
+
+    # A list (not an array), since the dimensions need not have the same number of cells.
+    freq = [fftfreq(n, d=d,b=b) for n, d in zip(N, dx)]
+    if not ret_cubegrid:
+        return ft, freq
+    else:
+        grid = freq[0] ** 2
+        for i in range(len(axes) - 1):
+            grid = np.add.outer(grid, freq[i+1] ** 2)
+
+        return ft, freq, np.sqrt(grid)
+
+
+def _forward_setup(X, L, Lk, b, axes):
+    "Get the transformed axes, their number of cells, and the real-space box lengths for a forward transform."
     if axes is None:
         axes = list(range(len(X.shape)))
 
@@ -125,22 +158,56 @@ def fft(X, L=None, Lk=None, a=0, b=2*np.pi, axes=None, ret_cubegrid=False):
             Lk = Lk * np.ones(len(axes))
         L = N*2*np.pi/(Lk*b) # Take account of the fourier convention.
 
-    V = float(np.product(L))    # Volume of box
-    Vx = V/np.product(N) # Volume of cell
+    return axes, N, L
 
-    ft = Vx*fftshift(fftn(X, axes=axes),axes=axes)*np.sqrt(np.abs(b)/(2*np.pi) ** (1 - a)) ** len(axes)
 
-    dx = np.array([float(l)/float(n) for l, n in zip(L, N)])
+def rfft(X, L=None, Lk=None, a=0, b=2*np.pi, axes=None, shift=True):
+    r"""
+    Arbitrary-dimension nice Fourier Transform of a real field, returning only the non-negative frequencies of the
+    last transformed axis.
 
-    freq = np.array([fftfreq(n, d=d,b=b) for n, d in zip(N, dx)])
-    if not ret_cubegrid:
-        return ft, freq
-    else:
-        grid = freq[0] ** 2
-        for i in range(len(axes) - 1):
-            grid = np.add.outer(grid, freq[i+1] ** 2)
+    This is the same as :func:`fft`, except that it wraps ``rfftn``. Because the transform of a real field is
+    Hermitian, the negative frequencies of the last axis are redundant, and are not computed. This is roughly twice as
+    fast, and uses half the memory.
 
-        return ft, freq, np.sqrt(grid)
+    Parameters
+    ----------
+    X : array
+        A real array with arbitrary dimensions defining the field to be transformed.
+
+    L, Lk, a, b, axes :
+        See :func:`fft`.
+
+    shift : bool, optional
+        Whether to centre the zero-frequency of all but the last transformed axis, as for :func:`fft`. Otherwise, the
+        transform (and the returned frequencies) are left in the standard FFT order, which saves a copy of the
+        transform when the order of the modes is unimportant.
+
+    Returns
+    -------
+    ft : array
+        The DFT of X, normalised to be consistent with the continuous transform. All axes but the last transformed
+        axis have their zero in the centre (if `shift`), as for :func:`fft`, while the last transformed axis has only
+        its ``N//2 + 1`` non-negative frequencies.
+
+    freq : list of arrays
+        The frequencies in each dimension, consistent with the Fourier conventions specified.
+    """
+    axes, N, L = _forward_setup(X, L, Lk, b, axes)
+
+    V = float(np.prod(L))    # Volume of box
+    Vx = V/np.prod(N) # Volume of cell
+
+    ft = rfftn(X, axes=axes)
+    if shift:
+        ft = fftshift(ft, axes=axes[:-1])
+    ft *= Vx*np.sqrt(np.abs(b)/(2*np.pi) ** (1 - a)) ** len(axes)
+
+    dx = np.array([float(l)/float(n) for l, n in zip(L, N)])
+
+    freq = [fftfreq(n, d=d, b=b) if shift else _fftfreq(n, d=d)*(2*np.pi/b) for n, d in zip(N[:-1], dx[:-1])]
+    freq.append(rfftfreq(N[-1], d=dx[-1], b=b))
+    return ft, freq
 
 
 def ifft(X, Lk=None,L=None, a=0, b=2*np.pi, axes=None,ret_cubegrid=False):
@@ -215,12 +282,13 @@ def ifft(X, Lk=None,L=None, a=0, b=2*np.pi, axes=None,ret_cubegrid=False):
 
     Lk = np.array(Lk)
 
-    V = np.product(Lk)
+    V = np.prod(Lk)
     dk = np.array([float(lk)/float(n) for lk, n in zip(Lk, N)])
 
     ft = V*ifftn(ifftshift(X,axes=axes), axes=axes)*np.sqrt(np.abs(b)/(2*np.pi) ** (1 + a)) ** len(axes)
 
-    freq = np.array([fftfreq(n, d=d,b=b) for n, d in zip(N, dk)])
+    # A list (not an array), since the dimensions need not have the same number of cells.
+    freq = [fftfreq(n, d=d,b=b) for n, d in zip(N, dk)]
 
     if not ret_cubegrid:
         return ft, freq
@@ -282,3 +350,27 @@ def fftfreq(N,d=1.0,b=2*np.pi):
 
     """
     return fftshift(_fftfreq(N, d=d))*(2*np.pi/b)
+
+
+def rfftfreq(N, d=1.0, b=2*np.pi):
+    """
+    Return the non-negative fourier frequencies of a real transform of a box with N cells, using general Fourier
+    convention.
+
+    Parameters
+    ----------
+    N : int
+        The number of grid cells
+
+    d : float, optional
+        The interval between cells
+
+    b : float, optional
+        The fourier-convention of the frequency component (see :mod:`powerbox.dft` for details).
+
+    Returns
+    -------
+    freq : array
+        The ``N//2 + 1`` non-negative frequency components of the real Fourier transform, starting at 0.
+    """
+    return _rfftfreq(N, d=d)*(2*np.pi/b)
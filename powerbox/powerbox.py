@@ -336,8 +336,10 @@ class LogNormalPowerBox(PowerBox):
         "The power spectrum required for a Gaussian field to produce the input power on a lognormal field"
         gca = empty((self.N,) * self.dim)
         gca[...] = self.gaussian_correlation_array()
-        gpa = np.abs(dft.fft(gca, L=self.boxlength, a=self.fourier_a, b=self.fourier_b))[0]
-        gpa[self.k() == 0] = 0
+        gpa = np.abs(dft.fft(gca, L=self.boxlength, a=self.fourier_a, b=self.fourier_b)[0])
+
+        # Zero the k=0 mode, found per-axis rather than from the full grid of magnitudes.
+        gpa[np.ix_(*[self.kvec == 0] * self.dim)] = 0
         return gpa
 
     def delta_k(self):
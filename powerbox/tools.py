@@ -5,21 +5,60 @@ for averaging a field angularly, and generating the isotropic power spectrum.
 from . import dft
 import numpy as np
 import warnings
+from functools import wraps
+
+# Try importing numba, which provides fused, multi-threaded kernels for the binning reductions. The kernels are cached
+# on disk (``cache=True``), so that they are only compiled the first time they are used, not in every new process.
+try:
+    from numba import njit, prange, get_num_threads
+
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
 
 
 def _getbins(bins, coords, log):
-    mx = coords.max()
     if not np.iterable(bins):
+        mn, mx = _coords_range(coords, log)
         if not log:
-            bins = np.linspace(coords.min(), mx, bins + 1)
+            bins = np.linspace(mn, mx, bins + 1)
         else:
-            mn = coords[coords>0].min()
             bins = np.logspace(np.log10(mn), np.log10(mx), bins + 1)
 
     return bins
 
 
-def angular_average(field, coords, bins, weights=1, average=True, bin_ave=True, get_variance=False, log_bins=False):
+def _coords_range(coords, log=False):
+    """
+    Get the minimum (or if `log`, minimum positive) and maximum co-ordinate magnitude.
+
+    `coords` is either a grid of co-ordinate magnitudes, or a list of 1D arrays of the co-ordinates in each dimension.
+    In the latter case, the range is found from the 1D arrays, without reducing over the full grid.
+    """
+    if isinstance(coords, np.ndarray):
+        if log:
+            return coords[coords > 0].min(), coords.max()
+        return coords.min(), coords.max()
+
+    squares = [np.asarray(c) ** 2 for c in coords]
+    mins = [sq.min() for sq in squares]
+
+    # Sum in the same order as _magnitude_grid, so the result is identical to reducing over the grid.
+    mx = np.sqrt(sum(sq.max() for sq in squares))
+    mn = np.sqrt(sum(mins))
+
+    if log and mn == 0:
+        # The smallest positive magnitude has one non-zero co-ordinate, with the rest at their minimum (zero).
+        mn = np.inf
+        for i, sq in enumerate(squares):
+            if np.any(sq > 0):
+                mn = min(mn, np.sqrt(sum(sq[sq > 0].min() if j == i else m for j, m in enumerate(mins))))
+
+    return mn, mx
+
+
+def angular_average(field, coords, bins, weights=1, average=True, bin_ave=True, get_variance=False, log_bins=False,
+                    bin_cache=None):
     r"""
     Average a given field within radial bins.
 
@@ -58,6 +97,11 @@ def angular_average(field, coords, bins, weights=1, average=True, bin_ave=True,
     log_bins : bool, optional
         Whether to create bins in log-space.
 
+    bin_cache : dict, optional
+        If given, the bin edges and the bin into which each cell falls are stored in (and, on subsequent calls,
+        retrieved from) this dictionary, saving their re-calculation when averaging many fields on the same grid.
+        The same dictionary must only be used with the same `coords`.
+
     Returns
     -------
     field_1d : 1D-array
@@ -98,17 +142,27 @@ def angular_average(field, coords, bins, weights=1, average=True, bin_ave=True,
     """
     if len(coords) == len(field.shape):
         # coords are a segmented list of dimensional co-ordinates
-        coords = _magnitude_grid(coords)
+        coords = list(coords)
+        bins = _getbins(bins, coords, log_bins)
+
+        # With numba, the co-ordinate magnitudes are computed on the fly, without storing the full grid.
+        if not HAVE_NUMBA:
+            coords = _magnitude_grid(coords)
+
+    if not np.isscalar(weights) and field.shape != weights.shape:
+        raise ValueError("the field and weights must have the same shape!")
 
-    indx, bins, sumweight = _get_binweights(coords, weights, bins, average, bin_ave=bin_ave, log_bins=log_bins)
+    # All first-pass sums (weights, co-ordinates and field) are accumulated together.
+    indx, bins, sumweight, sum_wf, sum_w2 = _get_binweights(coords, weights, bins, average, bin_ave=bin_ave,
+                                                            log_bins=log_bins, field=field, bin_cache=bin_cache)
 
     if np.any(sumweight==0):
         warnings.warn("One or more radial bins had no cells within it.")
 
-    res = _field_average(indx, field, weights, sumweight)
+    res = sum_wf / sumweight
 
     if get_variance:
-        var = _field_variance(indx, field, res, weights, sumweight)
+        var = _field_variance(indx, field, res, weights, sumweight, sum_w2)
         return res, bins, var
     else:
         return res, bins
@@ -116,27 +170,688 @@ def angular_average(field, coords, bins, weights=1, average=True, bin_ave=True,
 
 def _magnitude_grid(x, dim=None):
     if dim is not None:
-        return np.sqrt(np.sum(np.meshgrid(*([x ** 2] * dim)), axis=0))
-    else:
-        return np.sqrt(np.sum(np.meshgrid(*([X ** 2 for X in x])), axis=0))
+        x = [x] * dim
+
+    # Use a sparse grid and sum by broadcasting, so that only a single full-sized array is ever created.
+    squares = np.meshgrid(*[X ** 2 for X in x], indexing='ij', sparse=True)
+
+    grid = squares[0]
+    for sq in squares[1:]:
+        grid = grid + sq
+
+    return np.sqrt(grid)
+
+
+if HAVE_NUMBA:
+    def _pass_num_threads(kernel):
+        """
+        Wrap a kernel which accumulates into one private set of sums per thread, passing it the current number of
+        numba threads as its first argument. This is done outside the kernel, since a kernel which calls
+        ``get_num_threads`` cannot be cached.
+        """
+        @wraps(kernel)
+        def wrapper(*args):
+            return kernel(get_num_threads(), *args)
+
+        return wrapper
+
+    @_pass_num_threads
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _accumulate_bins(nchunks, indx, nslots, field_re, field_im, weights, coords, axes=None):
+        """
+        Accumulate every per-bin sum required for averaging in a single pass over the flattened arrays.
+
+        Each thread owns a private set of accumulators, which are reduced at the end, so that no two threads
+        write to the same bin concurrently. Any of `field_re`, `field_im`, `weights` and `coords` may be None, in
+        which case it is skipped (or, for `weights`, taken to be unity). `weights` may also be shorter than `indx`, in
+        which case it is repeated along it, as for weights which depend only on the last axis of the grid. Instead of
+        `coords`, `axes` may be given as the output of :func:`_axes_setup`, in which case the co-ordinate magnitude of
+        each cell is computed on the fly.
+
+        Returns an array of shape ``(5, nslots)``, with rows sum(w), sum(w^2), sum(w*coords), sum(w*re(field)) and
+        sum(w*im(field)).
+        """
+        n = len(indx)
+        chunk = (n + nchunks - 1) // nchunks
+
+        # The sums for each bin are interleaved, so that a cell only ever touches a single cache line.
+        acc = np.zeros((nchunks, nslots, 5))
+
+        for c in prange(nchunks):
+            start = c * chunk
+            if axes is not None:
+                sq, offsets, strides, shape = axes
+                nlast = shape[-1]
+                last = sq[offsets[-1]:]
+                k = start % nlast
+                base = _axes_row_base(start // nlast, sq, offsets, strides, shape)
+            if weights is not None:
+                nw = len(weights)
+                kw = start % nw
+
+            for i in range(start, min(start + chunk, n)):
+                j = indx[i]
+                if weights is None:
+                    w = 1.0
+                else:
+                    w = weights[kw]
+                    kw += 1
+                    if kw == nw:
+                        kw = 0
+
+                acc[c, j, 0] += w
+                acc[c, j, 1] += w * w
+                if coords is not None:
+                    acc[c, j, 2] += w * coords[i]
+                elif axes is not None:
+                    acc[c, j, 2] += w * np.sqrt(base + last[k])
+                    k += 1
+                    if k == nlast:
+                        k = 0
+                        base = _axes_row_base((i + 1) // nlast, sq, offsets, strides, shape)
+                if field_re is not None:
+                    acc[c, j, 3] += w * field_re[i]
+                if field_im is not None:
+                    acc[c, j, 4] += w * field_im[i]
+
+        out = acc[0].copy()
+        for c in range(1, nchunks):
+            out += acc[c]
+        return out.T.copy()
+
+    @_pass_num_threads
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _binned_variance(nchunks, indx, nslots, field, average, weights):
+        """
+        Accumulate the weighted squared deviation of the field from its bin average, in a single pass.
+
+        `average` has one entry per in-range bin (i.e. ``nslots - 2``). Cells falling outside the bins are skipped.
+        If `weights` is None, it is taken to be unity. Returns the sums for the in-range bins only.
+        """
+        n = len(indx)
+        chunk = (n + nchunks - 1) // nchunks
+        acc = np.zeros((nchunks, nslots))
+
+        for c in prange(nchunks):
+            for i in range(c * chunk, min((c + 1) * chunk, n)):
+                j = indx[i]
+                if j == 0 or j == nslots - 1:
+                    continue
+
+                d = field[i] - average[j - 1]
+                if weights is None:
+                    acc[c, j] += d * d
+                else:
+                    acc[c, j] += d * d * weights[i]
+
+        out = acc[0].copy()
+        for c in range(1, nchunks):
+            out += acc[c]
+        return out[1:-1]
+
+    @_pass_num_threads
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _accumulate_columns(nchunks, indx, nslots, field, weights):
+        """
+        Accumulate sum(w*field) per bin for every column of a real 2D `field` of shape ``(ncells, ncols)``, in one pass.
+
+        If `weights` is None, it is taken to be unity. Returns an array of shape ``(nslots, ncols)``.
+        """
+        n, ncols = field.shape
+        chunk = (n + nchunks - 1) // nchunks
+        acc = np.zeros((nchunks, nslots, ncols))
+
+        for c in prange(nchunks):
+            for i in range(c * chunk, min((c + 1) * chunk, n)):
+                j = indx[i]
+                if weights is None:
+                    w = 1.0
+                else:
+                    w = weights[i]
+
+                for k in range(ncols):
+                    acc[c, j, k] += w * field[i, k]
+
+        out = acc[0].copy()
+        for c in range(1, nchunks):
+            out += acc[c]
+        return out
+
+    @_pass_num_threads
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _binned_variance_columns(nchunks, indx, nslots, field, average, weights):
+        "Column-wise version of :func:`_binned_variance`, for `field` and `average` of shape ``(n, ncols)``."
+        n, ncols = field.shape
+        chunk = (n + nchunks - 1) // nchunks
+        acc = np.zeros((nchunks, nslots, ncols))
+
+        for c in prange(nchunks):
+            for i in range(c * chunk, min((c + 1) * chunk, n)):
+                j = indx[i]
+                if j == 0 or j == nslots - 1:
+                    continue
+
+                if weights is None:
+                    w = 1.0
+                else:
+                    w = weights[i]
+
+                for k in range(ncols):
+                    d = field[i, k] - average[j - 1, k]
+                    acc[c, j, k] += d * d * w
+
+        out = acc[0].copy()
+        for c in range(1, nchunks):
+            out += acc[c]
+        return out[1:-1]
+
+    @njit(cache=True)
+    def _digitize_sorted(x, bins, x0, dx):
+        "Equivalent to ``np.digitize(x, bins)`` for a single value `x` and any increasing `bins`, by binary search."
+        return np.searchsorted(bins, x, side='right')
+
+    @njit(cache=True)
+    def _correct_bin(x, bins, j):
+        "Move the estimated bin `j` of `x` so that it is exactly that given by ``np.digitize(x, bins)``."
+        nb = len(bins)
+        j = min(max(j, 1), nb - 1)
+        while j > 1 and x < bins[j - 1]:
+            j -= 1
+        while j < nb - 1 and x >= bins[j]:
+            j += 1
+        return j
+
+    @njit(cache=True)
+    def _digitize_linear(x, bins, x0, dx):
+        """
+        Equivalent to ``np.digitize(x, bins)`` for a single value `x` and `bins` regularly spaced in linear space, with
+        first edge `x0` and spacing `dx`. The bin is computed directly from the spacing, and checked against the
+        actual edges so that round-off never places a point in a different bin than ``np.digitize`` would.
+        """
+        if np.isnan(x) or x >= bins[-1]:
+            return len(bins)
+        elif x < bins[0]:
+            return 0
+        return _correct_bin(x, bins, int((x - x0) / dx) + 1)
+
+    @njit(cache=True)
+    def _digitize_log(x, bins, x0, dx):
+        "As :func:`_digitize_linear`, but for `bins` regularly spaced in log space (`x0` and `dx` being logged)."
+        if np.isnan(x) or x >= bins[-1]:
+            return len(bins)
+        elif x < bins[0]:
+            return 0
+        return _correct_bin(x, bins, int((np.log(x) - x0) / dx) + 1)
+
+    @njit(cache=True)
+    def _digitize_one(x, bins, x0, dx, mode):
+        "Digitize a single value `x` with the digitizer for `mode` (see :func:`_bin_spacing`)."
+        if mode == 2:
+            return _digitize_log(x, bins, x0, dx)
+        elif mode == 1:
+            return _digitize_linear(x, bins, x0, dx)
+        return _digitize_sorted(x, bins, x0, dx)
+
+    # The digitize kernels below test the mode of _bin_spacing outside of their loops over cells, rather than calling
+    # _digitize_one for each cell, which is about twice as slow.
+
+    @njit(parallel=True, cache=True)
+    def _flat_digitize(x, bins, x0, dx, mode, out):
+        "Apply the digitizer for `mode` to every element of the flat array `x`, in parallel, writing to `out`."
+        if mode == 2:
+            for i in prange(len(x)):
+                out[i] = _digitize_log(x[i], bins, x0, dx)
+        elif mode == 1:
+            for i in prange(len(x)):
+                out[i] = _digitize_linear(x[i], bins, x0, dx)
+        else:
+            for i in prange(len(x)):
+                out[i] = _digitize_sorted(x[i], bins, x0, dx)
+
+    @njit(cache=True)
+    def _axes_row_base(r, sq, offsets, strides, shape):
+        """
+        Get the sum of squared co-ordinates over all but the last axis, for row `r` (i.e. flat cells
+        ``r*shape[-1]`` to ``(r+1)*shape[-1]``) of the C-ordered grid defined by 1D co-ordinates along each axis. The
+        squares of these co-ordinates are concatenated in `sq`, with those of axis ``d`` starting at ``offsets[d]``.
+        """
+        i = r * shape[-1]
+        s = 0.0
+        for d in range(len(shape) - 1):
+            s += sq[offsets[d] + (i // strides[d]) % shape[d]]
+        return s
+
+    @njit(cache=True)
+    def _digitize_row(base, last, bins, x0, dx, mode, out):
+        "Write the bin of each magnitude ``sqrt(base + last[j])`` of a grid row into `out`, for the digitizer of `mode`."
+        if mode == 2:
+            for j in range(len(last)):
+                out[j] = _digitize_log(np.sqrt(base + last[j]), bins, x0, dx)
+        elif mode == 1:
+            for j in range(len(last)):
+                out[j] = _digitize_linear(np.sqrt(base + last[j]), bins, x0, dx)
+        else:
+            for j in range(len(last)):
+                out[j] = _digitize_sorted(np.sqrt(base + last[j]), bins, x0, dx)
+
+    @njit(parallel=True, cache=True)
+    def _axes_digitize(sq, offsets, strides, shape, bins, x0, dx, mode, out):
+        """
+        Apply the digitizer for `mode` to the co-ordinate magnitude of each cell of a grid defined by 1D co-ordinates
+        along each axis, computing the magnitudes on the fly, writing to `out`.
+        """
+        ncells = len(out)
+        nlast = shape[-1]
+        last = sq[offsets[-1]:]
+        for r in prange(ncells // nlast):
+            base = _axes_row_base(r, sq, offsets, strides, shape)
+            _digitize_row(base, last, bins, x0, dx, mode, out[r * nlast:(r + 1) * nlast])
+
+    @njit(parallel=True, cache=True)
+    def _axes_wavemode_digitize(isq, sq, offsets, strides, shape, table, bins, x0, dx, mode, out):
+        """
+        Like :func:`_axes_digitize`, but for co-ordinates which are integer multiples of a common spacing, whose
+        squared integer wavemodes are concatenated in `isq`. The bin of each cell is then looked up from `table`,
+        indexed by the cell's integer squared wavemode. Only where the table entry is negative (i.e. the wavemode is
+        too close to a bin edge to be unambiguous) is the magnitude of the cell computed and digitized. This is rare
+        enough that the mode is tested for each such cell.
+        """
+        ncells = len(out)
+        nlast = shape[-1]
+        ilast = isq[offsets[-1]:]
+        last = sq[offsets[-1]:]
+        for r in prange(ncells // nlast):
+            ibase = _axes_row_base(r, isq, offsets, strides, shape)
+            base = -1.0
+            for j in range(nlast):
+                b = table[int(ibase + ilast[j])]
+                if b < 0:
+                    if base < 0:
+                        base = _axes_row_base(r, sq, offsets, strides, shape)
+                    b = _digitize_one(np.sqrt(base + last[j]), bins, x0, dx, mode)
+                out[r * nlast + j] = b
+
+    @njit(parallel=True, cache=True)
+    def _cell_indx(pos, edges, N, period):
+        """
+        Get the flat (C-ordered) index of the grid cell in which each of the positions `pos` falls.
+
+        `pos` has shape ``(dim, npart)``, and the index is built up one dimension at a time, in a loop over particles
+        which reads just one co-ordinate. `edges` has shape ``(dim, max(N) + 1)`` and holds
+        the regularly spaced cell edges of each dimension, following the conventions of ``np.histogramdd`` (in
+        particular, the last cell includes its upper edge). The cell is computed from the spacing, and then checked
+        against the edges. Positions outside the grid get index ``prod(N)``. If `period` is not None, each position
+        is first wrapped as ``pos % period``, without forming the wrapped array.
+        """
+        dim, npart = pos.shape
+        ncells = 1
+        for d in range(dim):
+            ncells *= N[d]
+
+        # Out-of-range particles are flagged as negative until the end.
+        out = np.zeros(npart, dtype=np.intp)
+        for d in range(dim):
+            n = N[d]
+            lo = edges[d, 0]
+            hi = edges[d, n]
+            scale = n / (hi - lo)
+            x = pos[d]
+
+            for i in prange(npart):
+                xi = x[i]
+                if period is not None:
+                    xi = xi % period[d]
+
+                if out[i] < 0 or not (lo <= xi <= hi):
+                    out[i] = -1
+                    continue
+
+                j = min(max(int((xi - lo) * scale), 0), n - 1)
+                while j > 0 and xi < edges[d, j]:
+                    j -= 1
+                while j < n - 1 and xi >= edges[d, j + 1]:
+                    j += 1
+                out[i] = out[i] * n + j
+
+        for i in prange(npart):
+            if out[i] < 0:
+                out[i] = ncells
+
+        return out
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _cross_power_kernel(FT, FT2, scale, out):
+        "Write ``scale * Re(FT * conj(FT2))`` into `out` (all flat), in one pass. If `FT2` is None, it is `FT`."
+        for i in prange(len(FT)):
+            z = FT[i]
+            if FT2 is None:
+                out[i] = (z.real * z.real + z.imag * z.imag) * scale
+            else:
+                z2 = FT2[i]
+                out[i] = (z.real * z2.real + z.imag * z2.imag) * scale
+
+else:
+    def _accumulate_bins(indx, nslots, field_re, field_im, weights, coords, axes=None):
+        "Pure-numpy equivalent of the numba kernel, using a bincount per required sum. `axes` is not supported."
+        if weights is not None and len(weights) < len(indx):
+            weights = np.tile(weights, len(indx) // len(weights))
+
+        out = np.zeros((5, nslots))
+        out[0] = np.bincount(indx, weights=weights, minlength=nslots)
+        out[1] = out[0] if weights is None else np.bincount(indx, weights=weights ** 2, minlength=nslots)
+
+        for row, x in ((2, coords), (3, field_re), (4, field_im)):
+            if x is not None:
+                out[row] = np.bincount(indx, weights=x if weights is None else weights * x, minlength=nslots)
+
+        return out
+
+    def _binned_variance(indx, nslots, field, average, weights):
+        "Pure-numpy equivalent of the numba kernel."
+        # We have to pad the average vector with 0s on either side to account for cells outside the bin range.
+        sqdev = (field - np.concatenate(([0], average, [0]))[indx]) ** 2
+        if weights is not None:
+            sqdev *= weights
+        return np.bincount(indx, weights=sqdev, minlength=nslots)[1:-1]
+
+    def _column_bincount(indx, nslots, x):
+        "Bincount every column of the 2D array `x` at once, by offsetting the bin index of each column."
+        ncols = x.shape[1]
+        cindx = (indx[:, None] * ncols + np.arange(ncols)).ravel()
+        return np.bincount(cindx, weights=x.ravel(), minlength=nslots * ncols).reshape((nslots, ncols))
+
+    def _accumulate_columns(indx, nslots, field, weights):
+        "Pure-numpy equivalent of the numba kernel."
+        return _column_bincount(indx, nslots, field if weights is None else weights[:, None] * field)
+
+    def _binned_variance_columns(indx, nslots, field, average, weights):
+        "Pure-numpy equivalent of the numba kernel."
+        pad = np.zeros((1, field.shape[1]))
+        sqdev = (field - np.concatenate((pad, average, pad))[indx]) ** 2
+        if weights is not None:
+            sqdev *= weights[:, None]
+        return _column_bincount(indx, nslots, sqdev)[1:-1]
+
+
+def _bin_spacing(bins, log_bins=False):
+    """
+    Get the mode (selecting the digitizer of the numba kernels), first edge and spacing of `bins`.
+
+    Mode is 1 or 2 (first edge and spacing logged) if the bins are increasing and regular in linear or log space
+    respectively, and 0 otherwise.
+    """
+    bins = np.asarray(bins, dtype=float)
+    if len(bins) > 2:
+        if log_bins and bins[0] > 0:
+            spacing = np.diff(np.log(bins))
+            if spacing[0] > 0 and np.allclose(spacing, spacing[0]):
+                return 2, np.log(bins[0]), (np.log(bins[-1]) - np.log(bins[0])) / (len(bins) - 1)
+
+        spacing = np.diff(bins)
+        if spacing[0] > 0 and np.allclose(spacing, spacing[0]):
+            return 1, bins[0], (bins[-1] - bins[0]) / (len(bins) - 1)
+
+    return 0, 0., 0.
+
+
+def _index_dtype(nslots):
+    """
+    Get the smallest integer type which holds bin indices up to `nslots`.
+
+    The bin index of every cell is read in each pass over the grid (and may be stored in a `bin_cache`), so a compact
+    type significantly reduces memory traffic on large grids.
+    """
+    for dtype in (np.int16, np.int32):
+        if nslots <= np.iinfo(dtype).max:
+            return dtype
+    return np.intp
 
 
-def _get_binweights(coords, weights, bins, average=True, bin_ave=True, log_bins=False):
+def _digitize(x, bins, log_bins=False):
+    """
+    Get the bin index of each element of the flat array `x`, with the same semantics as ``np.digitize``. With numba,
+    the indices are of the type given by :func:`_index_dtype`.
+    """
+    if HAVE_NUMBA:
+        mode, x0, dx = _bin_spacing(bins, log_bins)
+        if mode:
+            out = np.empty(len(x), dtype=_index_dtype(len(bins) + 1))
+            _flat_digitize(x, np.asarray(bins, dtype=float), x0, dx, mode, out)
+            return out
+
+    return np.digitize(x, bins)
+
+
+def _axes_setup(coords):
+    "Get the concatenated squares, offsets, strides and shape describing the grid of 1D `coords` for numba kernels."
+    shape = np.array([len(c) for c in coords])
+    sq = np.concatenate([np.asarray(c, dtype=float) ** 2 for c in coords])
+    offsets = np.concatenate(([0], np.cumsum(shape)[:-1]))
+    strides = np.concatenate((np.cumprod(shape[::-1])[::-1][1:], [1]))
+    return sq, offsets, strides, shape
+
+
+def _wavemodes(coords, rtol=1e-12):
+    """
+    Get the integer wavemodes of each of the 1D `coords`, and their common spacing.
+
+    Returns None unless every co-ordinate is (to within `rtol`) an integer multiple of a single spacing, as for the
+    Fourier modes of a box with the same side length in each dimension.
+    """
+    coords = [np.asarray(c, dtype=float) for c in coords]
+    nonzero = [np.abs(c[c != 0]) for c in coords if np.any(c != 0)]
+    if not nonzero:
+        return None
+
+    dk = min(c.min() for c in nonzero)
+    modes = [np.round(c / dk) for c in coords]
+    if not all(np.allclose(m * dk, c, rtol=rtol, atol=0) for m, c in zip(modes, coords)):
+        return None
+
+    return modes, dk
+
+
+def _axes_digitize_coords(coords, bins, log_bins=False):
+    """
+    Get the bin index of each cell of the grid defined by the 1D `coords` of each dimension, binned by co-ordinate
+    magnitude, without constructing the grid of magnitudes.
+
+    If the co-ordinates are integer multiples of a common spacing, each cell is binned by looking up its integer
+    squared wavemode in a table of bin indices, rather than digitizing its magnitude.
+
+    The numba kernels require increasing `bins`. Otherwise, the grid of magnitudes is built and passed to
+    ``np.digitize``, which handles decreasing bins (and raises an error for non-monotonic ones).
+    """
+    bins = np.asarray(bins, dtype=float)
+    mode, x0, dx = _bin_spacing(bins, log_bins)
+    if not mode and not np.all(np.diff(bins) > 0):
+        return np.digitize(_magnitude_grid(coords).ravel(), bins)
+
+    sq, offsets, strides, shape = _axes_setup(coords)
+    out = np.empty(int(_prod(shape)), dtype=_index_dtype(len(bins) + 1))
+
+    wavemodes = _wavemodes(coords)
+    if wavemodes is not None:
+        modes, dk = wavemodes
+        isq = _axes_setup(modes)[0]
+        nmax = int(sum(m.max() for m in np.split(isq, offsets[1:])))
+
+        # Only worthwhile if there are fewer distinct wavemodes than cells.
+        if nmax < len(out):
+            # Wavemodes whose magnitude is within round-off of a bin edge are marked (-1) to be digitized exactly.
+            k = dk * np.sqrt(np.arange(nmax + 1))
+            lo = _digitize(k * (1 - 1e-10), bins, log_bins)
+            hi = _digitize(k * (1 + 1e-10), bins, log_bins)
+            table = np.where(lo == hi, lo, -1).astype(out.dtype)
+
+            _axes_wavemode_digitize(isq, sq, offsets, strides, shape, table, bins, x0, dx, mode, out)
+            return out
+
+    _axes_digitize(sq, offsets, strides, shape, bins, x0, dx, mode, out)
+    return out
+
+
+def _is_axes(coords):
+    "Whether `coords` is a list of 1D co-ordinate arrays (rather than a grid of magnitudes)."
+    return isinstance(coords, list)
+
+
+def _histogram(pos, edges, weights=None, period=None):
+    """
+    Histogram the ``(npart, dim)`` positions `pos` onto a grid, equivalent to
+    ``np.histogramdd(pos, bins=edges, weights=weights)[0]`` for regularly spaced `edges`.
+
+    If `period` is given, the positions are wrapped as ``pos % period`` before being binned. The histogram is always
+    returned as float64.
+    """
+    if period is not None:
+        period = np.asarray(period, dtype=float) * np.ones(pos.shape[1])
+
+    if not HAVE_NUMBA:
+        return np.histogramdd(pos if period is None else pos % period, bins=edges, weights=weights)[0]
+
+    N = np.array([len(e) - 1 for e in edges])
+    padded = np.full((len(edges), N.max() + 1), np.inf)
+    for d, e in enumerate(edges):
+        padded[d, :len(e)] = e
+
+    # Find the cell of each particle in parallel, then count them all in a single pass. The kernel works through one
+    # co-ordinate at a time, which is contiguous if `pos` is Fortran-ordered, but is not worth copying otherwise.
+    indx = _cell_indx(np.asarray(pos, dtype=float).T, padded, N, period)
+    counts = np.bincount(indx, weights=weights, minlength=_prod(N) + 1)[:-1].reshape(N)
+
+    # Weighted counts are already float64, and are not copied.
+    return counts.astype(float, copy=False)
+
+
+def _cross_power(FT, FT2=None, scale=1.0):
+    """
+    Get ``scale * Re(FT * conj(FT2))``, without creating any complex temporaries. If `FT2` is None, the auto-power of
+    `FT` is returned.
+    """
+    if not HAVE_NUMBA:
+        if FT2 is None:
+            P = FT.real ** 2
+            P += FT.imag ** 2
+        else:
+            P = FT.real * FT2.real
+            P += FT.imag * FT2.imag
+        P *= scale
+        return P
+
+    P = np.empty(FT.shape, dtype=FT.real.dtype)
+    _cross_power_kernel(FT.ravel(), None if FT2 is None else FT2.ravel(), scale, P.ravel())
+    return P
+
+
+def _bin_sums(indx, nslots, field=None, weights=1, coords=None):
+    """
+    Get the weighted sums of unity, weights, coords and field within each bin, in one pass over the data.
+
+    Parameters
+    ----------
+    indx : 1D int array
+        The bin index of each (flattened) cell, as returned by ``np.digitize``.
+    nslots : int
+        The number of possible values of `indx` (i.e. ``len(bins) + 1``).
+    field, weights, coords : nd-arrays, optional
+        Arrays of the same size as `indx`. `weights` may also be a scalar, in which case it scales the sums of
+        `field` and `coords`, but `sum_w` and `sum_w2` are the plain counts. If `field` or `coords` are None, their
+        sums are not computed. With numba, `coords` may also be a list of the 1D co-ordinates of each dimension,
+        whose magnitudes are then computed on the fly.
+
+    Returns
+    -------
+    sum_w, sum_w2, sum_wc, sum_wf : 1D-arrays
+        The sums of weights, squared weights, weighted coords and weighted field in each bin, stripped of the
+        out-of-range slots. `sum_wf` is complex if `field` is complex.
+    """
+    wscalar = np.isscalar(weights)
+    w = None if wscalar else _flat_weights(weights)
+
+    axes = None
+    if coords is not None and _is_axes(coords):
+        axes = _axes_setup(coords)
+        coords = None
+    elif coords is not None:
+        coords = np.asarray(coords).ravel()
+
+    field_re = field_im = None
+    if field is not None:
+        field = np.asarray(field).ravel()
+        field_re = field.real
+        if field.dtype.kind == "c":
+            field_im = field.imag
+
+    sums = _accumulate_bins(indx, nslots, field_re, field_im, w, coords, axes)[:, 1:-1]
+
+    if wscalar:
+        # Apply scalar weights to the (small) bin arrays rather than the full field. As for an unweighted
+        # bincount, the counts themselves are not scaled.
+        sums[2:] *= weights
+
+    sum_wf = sums[3] + 1j * sums[4] if field_im is not None else sums[3]
+
+    return sums[0], sums[1], sums[2], sum_wf
+
+
+def _flat_weights(weights):
+    """
+    Flatten `weights`. If they vary only along the last axis (i.e. are broadcast from a 1D array, as those of
+    :func:`_hermitian_weights`), only that axis is returned, to be repeated over the cells by :func:`_accumulate_bins`.
+    """
+    weights = np.asarray(weights)
+    if weights.ndim > 1 and not any(weights.strides[:-1]):
+        return weights[(0,) * (weights.ndim - 1)]
+    return weights.ravel()
+
+
+def _get_bin_indx(coords, bins, log_bins=False, bin_cache=None):
+    """
+    Get the bin edges, and the bin index of each cell, optionally re-using those stored in `bin_cache`.
+
+    `coords` is either a grid of co-ordinate magnitudes, or (only if numba is available) a list of the 1D co-ordinates
+    of each dimension, in which case the magnitudes are computed on the fly.
+    """
+    shape = tuple(len(c) for c in coords) if _is_axes(coords) else coords.shape
+
+    if bin_cache is not None:
+        key = (shape, np.asarray(bins, dtype=float).tobytes(), log_bins)
+        if key in bin_cache:
+            return bin_cache[key]
 
     # Get a vector of bin edges
     bins = _getbins(bins, coords, log_bins)
 
     # Minus 1 to have first index at 0
-    indx = np.digitize(coords.flatten(), bins)
+    if _is_axes(coords):
+        indx = _axes_digitize_coords(coords, bins, log_bins)
+    else:
+        indx = _digitize(coords.ravel(), bins, log_bins)
 
-    if average or bin_ave:
-        if not np.isscalar(weights):
-            if coords.shape != weights.shape:
-                raise ValueError("coords and weights must have the same shape!")
-            sumweights = np.bincount(indx, weights=weights.flatten(), minlength=len(bins)+1)[1:-1]
-        else:
-            sumweights = np.bincount(indx, minlength=len(bins)+1)[1:-1]
+    if bin_cache is not None:
+        bin_cache[key] = (bins, indx)
 
+    return bins, indx
+
+
+def _get_binweights(coords, weights, bins, average=True, bin_ave=True, log_bins=False, field=None, bin_cache=None):
+    """
+    Get the bin index of each cell, the bin co-ordinates, the normalisation of each bin and the sum of squared
+    weights in each bin.
+
+    If `field` is given, the weighted sum of the field in each bin is also returned (before the squared weights),
+    having been accumulated in the same pass as the bin weights.
+    """
+    bins, indx = _get_bin_indx(coords, bins, log_bins, bin_cache)
+
+    shape = tuple(len(c) for c in coords) if _is_axes(coords) else coords.shape
+    if not np.isscalar(weights) and shape != weights.shape:
+        raise ValueError("coords and weights must have the same shape!")
+
+    sumweights, sum_w2, sum_wc, sum_wf = _bin_sums(indx, len(bins) + 1, field, weights, coords if bin_ave else None)
+
+    if average or bin_ave:
         if average:
             binweight = sumweights
         else:
@@ -144,48 +859,60 @@ def _get_binweights(coords, weights, bins, average=True, bin_ave=True, log_bins=
             sumweights = np.ones_like(binweight)
 
         if bin_ave:
-            bins = np.bincount(indx, weights=(weights * coords).flatten(), minlength=len(bins)+1)[1:-1] / binweight
+            bins = sum_wc / binweight
 
     else:
         sumweights = np.ones(len(bins)-1)
 
-    return indx, bins, sumweights
+    if field is None:
+        return indx, bins, sumweights, sum_w2
+    else:
+        return indx, bins, sumweights, sum_wf, sum_w2
 
 
 def _field_average(indx, field, weights, sumweights):
-    if not np.isscalar(weights) and field.shape != weights.shape:
+    """
+    Average each column of `field`, of shape ``(ncells, ncols)``, within bins, all in a single pass.
+    """
+    if not np.isscalar(weights) and field.shape[:np.ndim(weights)] != weights.shape:
         raise ValueError("the field and weights must have the same shape!")
 
-    field = field * weights  # Leave like this because field is mutable
-
-    rl = np.bincount(indx, weights=np.real(field.flatten()), minlength=len(sumweights)+2)[1:-1] / sumweights
+    w = None if np.isscalar(weights) else weights
+    res = _accumulate_columns(indx, len(sumweights) + 2, field.real, w)[1:-1]
     if field.dtype.kind == "c":
-        im = 1j * np.bincount(indx, weights=np.imag(field.flatten()), minlength=len(sumweights)+2)[1:-1] / sumweights
-    else:
-        im = 0
+        res = res + 1j * _accumulate_columns(indx, len(sumweights) + 2, field.imag, w)[1:-1]
 
-    return rl + im
+    if w is None:
+        res *= weights
 
+    return res / sumweights[:, None]
 
-def _field_variance(indx, field, average, weights, V1):
+
+def _field_variance(indx, field, average, weights, V1, V2):
     if field.dtype.kind == "c":
         raise NotImplementedError("Cannot use a complex field when computing variance, yet.")
 
-    # Create a full flattened array of the same shape as field, with the average in that bin.
-    # We have to pad the average vector with 0s on either side to account for cells outside the bin range.
-    average_field = np.concatenate(([0],average, [0]))[indx]
+    # Multiple columns of shape (ncells, ncols) are handled together.
+    if average.ndim == 2:
+        variance = _binned_variance_columns
+    else:
+        variance = _binned_variance
+        field = field.ravel()
 
-    # Create the V2 array
+    # V2 (the sum of squared weights) was accumulated alongside V1, and is just V1 for scalar weights.
     if not np.isscalar(weights):
-        weights = weights.flatten()
-        V2 = np.bincount(indx, weights=weights**2, minlength=len(V1)+2)[1:-1]
+        weights = weights.ravel()
+        sqdev = variance(indx, len(V1) + 2, field, average, weights)
     else:
         V2 = V1
+        sqdev = weights * variance(indx, len(V1) + 2, field, average, None)
 
-    field = (field.flatten()-average_field)**2 * weights
+    if average.ndim == 2:
+        V1 = V1[:, None]
+        V2 = V2[:, None]
 
     # This res is the estimated variance of each cell in the bin
-    res = np.bincount(indx, weights=field, minlength=len(V1)+2)[1:-1] / (V1 - V2/V1)
+    res = sqdev / (V1 - V2/V1)
 
     # Modify to the estimated variance of the sum of the cells in the bin.
     res *= V2 / V1**2
@@ -194,7 +921,7 @@ def _field_variance(indx, field, average, weights, V1):
 
 
 def angular_average_nd(field, coords, bins, n=None, weights=1, average=True, bin_ave=True, get_variance=False,
-                       log_bins=False):
+                       log_bins=False, bin_cache=None):
     """
     Average the first n dimensions of a given field within radial bins.
 
@@ -238,6 +965,10 @@ def angular_average_nd(field, coords, bins, n=None, weights=1, average=True, bin
     log_bins : bool, optional
         Whether to create bins in log-space.
 
+    bin_cache : dict, optional
+        If given, the bin edges and the bin into which each cell falls are stored in (and, on subsequent calls,
+        retrieved from) this dictionary. See :func:`angular_average`.
+
     Returns
     -------
     field : (m-n+1)-array
@@ -282,29 +1013,31 @@ def angular_average_nd(field, coords, bins, n=None, weights=1, average=True, bin
         raise ValueError("coords should be a list of arrays, one for each dimension.")
 
     if n == len(coords):
-        return angular_average(field, coords, bins, weights, average, bin_ave, get_variance, log_bins=log_bins)
-
-    coords = _magnitude_grid([c for i, c in enumerate(coords) if i < n])
+        return angular_average(field, coords, bins, weights, average, bin_ave, get_variance, log_bins=log_bins,
+                               bin_cache=bin_cache)
 
-    indx, bins, sumweights = _get_binweights(coords, weights, bins, average, bin_ave=bin_ave, log_bins=log_bins)
+    coords = [c for i, c in enumerate(coords) if i < n]
+    bins = _getbins(bins, coords, log_bins)
+    if not HAVE_NUMBA:
+        coords = _magnitude_grid(coords)
 
-    n1 = np.product(field.shape[:n])
-    n2 = np.product(field.shape[n:])
+    indx, bins, sumweights, sum_w2 = _get_binweights(coords, weights, bins, average, bin_ave=bin_ave,
+                                                     log_bins=log_bins, bin_cache=bin_cache)
 
-    res = np.zeros((len(sumweights), n2), dtype=field.dtype)
-    if get_variance:
-        var = np.zeros_like(res)
+    n1 = _prod(field.shape[:n])
+    n2 = _prod(field.shape[n:])
 
-    for i, fld in enumerate(field.reshape((n1, n2)).T):
-        try:
-            w = weights.flatten()
-        except AttributeError:
-            w = weights
+    try:
+        w = weights.ravel()
+    except AttributeError:
+        w = weights
 
-        res[:, i] = _field_average(indx, fld, w, sumweights)
+    # All columns of the un-averaged dimensions are averaged together, in a single pass over the cells.
+    fld = field.reshape((n1, n2))
+    res = _field_average(indx, fld, w, sumweights).astype(field.dtype)
 
-        if get_variance:
-            var[:, i] = _field_variance(indx, fld, res[:,i], w, sumweights)
+    if get_variance:
+        var = _field_variance(indx, fld, res, w, sumweights, sum_w2).astype(field.dtype)
 
     if not get_variance:
         return res.reshape((len(sumweights),) + field.shape[n:]), bins
@@ -312,9 +1045,62 @@ def angular_average_nd(field, coords, bins, n=None, weights=1, average=True, bin
         return res.reshape((len(sumweights),) + field.shape[n:]), bins, var
 
 
+def _prod(x):
+    "Get the product of a short sequence of Python numbers, without the overhead of a numpy reduction."
+    p = 1
+    for v in x:
+        p *= v
+    return p
+
+
+def _as_precision(x, dtype):
+    "Cast `x` to the real `dtype`, or (if `x` is complex) to the complex type of the same precision."
+    if np.iscomplexobj(x):
+        dtype = np.result_type(dtype, np.complex64)
+    return x.astype(dtype, copy=False)
+
+
+def _normalize_box_spec(N, boxlength, dim):
+    """
+    Get the number of cells and the box length in each of `dim` dimensions, as tuples, from either scalars (which
+    apply to every dimension) or sequences. Tuples of the right length are passed straight through.
+    """
+    if not (type(N) is tuple and len(N) == dim):
+        N = tuple(N) if np.iterable(N) else (N,) * dim
+
+    if not (type(boxlength) is tuple and len(boxlength) == dim):
+        boxlength = tuple(boxlength) if np.iterable(boxlength) else (boxlength,) * dim
+
+    return N, boxlength
+
+
+def _hermitian_weights(shape, n, bin_cache=None):
+    """
+    Get the weight of each mode of the real FFT (of shape `shape`) of a field with `n` cells along its last axis, such
+    that each mode whose negative-frequency partner was dropped stands in for both.
+
+    The weights depend only on the last axis, so they are returned as a read-only view of a 1D array, broadcast to
+    `shape`, which the binning kernels use without forming the full array. They are stored in `bin_cache` if given.
+    """
+    key = ("hermitian", shape, n)
+    if bin_cache is not None and key in bin_cache:
+        return bin_cache[key]
+
+    weights = np.full(shape[-1], 2.)
+    weights[0] = 1
+    if n % 2 == 0:
+        weights[-1] = 1  # The Nyquist mode has no partner
+    weights = np.broadcast_to(weights, shape)
+
+    if bin_cache is not None:
+        bin_cache[key] = weights
+
+    return weights
+
+
 def get_power(deltax, boxlength, deltax2=None, N=None, a=1., b=1., remove_shotnoise=True,
               vol_normalised_power=True, bins=None, res_ndim=None, weights=None, weights2=None,
-              dimensionless=True, bin_ave=True, get_variance=False, log_bins=False):
+              dimensionless=True, bin_ave=True, get_variance=False, log_bins=False, bin_cache=None, dtype=None):
     r"""
     Calculate the isotropic power spectrum of a given field, or cross-power of two similar fields.
 
@@ -376,6 +1162,20 @@ def get_power(deltax, boxlength, deltax2=None, N=None, a=1., b=1., remove_shotno
     log_bins : bool, optional
         Whether to create bins in log-space.
 
+    bin_cache : dict, optional
+        If given, the k-bin edges, the bin into which each cell falls and the weight of each mode are stored in (and,
+        on subsequent calls, retrieved from) this dictionary, which is useful when measuring the power of many boxes
+        of the same shape. The same dictionary must only be used for boxes with the same shape, `boxlength` and
+        Fourier convention.
+
+    dtype : dtype, optional
+        The real floating-point type (eg. ``np.float32``) in which to compute the FFTs and the power grid, if pyFFTW is
+        installed. Complex fields are cast to the complex type of the same precision. Single precision halves their
+        memory and speeds up the transforms, and is usually ample given the cosmic variance of the measured power. Bin
+        averages are always accumulated in double precision. By default, the precision of `deltax` (or double, for a
+        discrete sample) is used. The numpy FFT always transforms in double precision, so without pyFFTW this is
+        ignored.
+
     Returns
     -------
     p_k : array
@@ -416,11 +1216,7 @@ def get_power(deltax, boxlength, deltax2=None, N=None, a=1., b=1., remove_shotno
         if deltax2 is not None and dim != deltax2.shape[1]:
             raise ValueError("deltax and deltax2 must have the same number of dimensions!")
 
-        if not np.iterable(N):
-            N = [N] * dim
-
-        if not np.iterable(boxlength):
-            boxlength = [boxlength] * dim
+        N, boxlength = _normalize_box_spec(N, boxlength, dim)
 
         Npart1 = deltax.shape[0]
 
@@ -432,57 +1228,83 @@ def get_power(deltax, boxlength, deltax2=None, N=None, a=1., b=1., remove_shotno
         # Generate a histogram of the data, with appropriate number of bins.
         edges = [np.linspace(0, L, n + 1) for L, n in zip(boxlength, N)]
 
-        deltax = np.histogramdd(deltax % boxlength, bins=edges, weights=weights)[0].astype("float")
+        deltax = _histogram(deltax, edges, weights, period=boxlength)
 
         if deltax2 is not None:
-            deltax2 = np.histogramdd(deltax2 % boxlength, bins=edges, weights=weights2)[0].astype("float")
+            deltax2 = _histogram(deltax2, edges, weights2, period=boxlength)
+
+        # Convert sampled data to mean-zero data. Every (wrapped) particle lands in the grid, so the mean is known
+        # without reducing over it, and the grids are normalised in-place.
+        ncells = float(_prod(N))
+        mean = (Npart1 if weights is None else np.sum(weights)) / ncells
+        if deltax2 is not None:
+            mean2 = (Npart2 if weights2 is None else np.sum(weights2)) / ncells
 
-        # Convert sampled data to mean-zero data
         if dimensionless:
-            deltax = deltax / np.mean(deltax) - 1
+            deltax /= mean
+            deltax -= 1
             if deltax2 is not None:
-                deltax2 = deltax2 / np.mean(deltax2) - 1
+                deltax2 /= mean2
+                deltax2 -= 1
         else:
-            deltax -= np.mean(deltax)
+            deltax -= mean
             if deltax2 is not None:
-                deltax2 -= np.mean(deltax2)
+                deltax2 -= mean2
     else:
         # If input data is already a density field, just get the dimensions.
         dim = len(deltax.shape)
 
-        if not np.iterable(boxlength):
-            boxlength = [boxlength] * dim
+        N, boxlength = _normalize_box_spec(deltax.shape, boxlength, dim)
 
-        if deltax2 is not None and deltax.shape != len(deltax2.shape):
+        if deltax2 is not None and deltax.shape != deltax2.shape:
             raise ValueError("deltax and deltax2 must have the same shape!")
 
-        N = deltax.shape
         Npart1 = None
 
-    V = np.product(boxlength)
+    # numpy's FFT promotes single-precision input to double, so casting would only lose precision.
+    if dtype is not None and dft.HAVE_FFTW:
+        deltax = _as_precision(deltax, dtype)
+        if deltax2 is not None:
+            deltax2 = _as_precision(deltax2, dtype)
+
+    V = float(_prod(boxlength))
+
+    if res_ndim is None:
+        res_ndim = dim
+
+    # The (cross-)power of real fields is symmetric (P(k) = P(-k)), so when averaging over all dimensions, only half
+    # the modes are needed. Each kept mode with a dropped partner stands in for both, and is given twice the weight.
+    # The variance estimate assumes many independent cells, so it uses all of them.
+    hermitian = res_ndim == dim and not get_variance and np.isrealobj(deltax) and \
+        (deltax2 is None or np.isrealobj(deltax2))
 
     # Calculate the n-D power spectrum and align it with the k from powerbox.
-    FT, freq, k = dft.fft(deltax, L=boxlength, a=a, b=b, ret_cubegrid=True)
+    if hermitian:
+        # The order of the modes is irrelevant to the average, so they are not shifted.
+        FT, freq = dft.rfft(deltax, L=boxlength, a=a, b=b, shift=False)
+        kweights = _hermitian_weights(FT.shape, deltax.shape[-1], bin_cache)
+    else:
+        FT, freq = dft.fft(deltax, L=boxlength, a=a, b=b)
+        kweights = 1
 
     if deltax2 is not None:
-        FT2 = dft.fft(deltax2, L=boxlength, a=a, b=b)[0]
+        if hermitian:
+            FT2 = dft.rfft(deltax2, L=boxlength, a=a, b=b, shift=False)[0]
+        else:
+            FT2 = dft.fft(deltax2, L=boxlength, a=a, b=b)[0]
     else:
-        FT2 = FT
+        FT2 = None
 
-    P = np.real(FT * np.conj(FT2) / V ** 2)
-
-    if vol_normalised_power:
-        P *= V
-
-    if res_ndim is None:
-        res_ndim = dim
+    # The conjugate product, its real part and the normalisation are all done in one pass.
+    P = _cross_power(FT, FT2, 1. / V if vol_normalised_power else 1. / V ** 2)
 
     # Determine a nice number of bins.
     if bins is None:
-        bins = int(np.product(N[:res_ndim]) ** (1. / res_ndim) / 2.2)
+        bins = int(_prod(N[:res_ndim]) ** (1. / res_ndim) / 2.2)
 
     # res is (P, k, <var>)
-    res = angular_average_nd(P, freq, bins, n=res_ndim, bin_ave=bin_ave, get_variance=get_variance, log_bins=log_bins)
+    res = angular_average_nd(P, freq, bins, n=res_ndim, weights=kweights, bin_ave=bin_ave, get_variance=get_variance,
+                             log_bins=log_bins, bin_cache=bin_cache)
     res = list(res)
     # Remove shot-noise
     if remove_shotnoise and Npart1:
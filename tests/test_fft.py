@@ -149,3 +149,40 @@ def test_mixed_unitary_ordinary_unitary_angular_2d_bf():
 
     Fk_, bins = angular_average(Fk_, kgrid, 200)
     assert np.max(np.abs(Fk_ - 2*np.pi*np.exp(-alpha*((2*np.pi)*bins) ** 2)))
+
+
+def test_rfft_matches_fft():
+    from powerbox.dft import rfft
+
+    for n in (10, 11):
+        x = np.random.normal(size=(n, 6, n))
+        Fx, freq = fft(x, L=L, a=1, b=1)
+        Rx, rfreq = rfft(x, L=L, a=1, b=1)
+
+        assert Rx.shape[-1] == n // 2 + 1
+        assert np.allclose(Fx[..., n // 2:], Rx[..., :n - n // 2])
+        assert np.allclose(freq[-1][n // 2:], rfreq[-1][:n - n // 2])
+        assert np.allclose(freq[0], rfreq[0])
+
+
+def test_rfft_unshifted():
+    from powerbox.dft import rfft, ifftshift
+
+    x = np.random.normal(size=(10, 7, 8))
+    Rx, freq = rfft(x, L=L, a=1, b=1)
+    Ux, ufreq = rfft(x, L=L, a=1, b=1, shift=False)
+
+    assert np.allclose(ifftshift(Rx, axes=(0, 1)), Ux)
+    for f, uf in zip(freq[:-1], ufreq[:-1]):
+        assert np.allclose(ifftshift(f), uf)
+    assert np.allclose(freq[-1], ufreq[-1])
+
+
+def test_ifft_non_cubic():
+    x = np.random.normal(size=(10, 6, 11))
+    Fx, freq = fft(x, L=L, a=1, b=1)
+    x_, r = ifft(Fx, L=L, a=1, b=1)
+
+    assert [len(f) for f in freq] == [10, 6, 11]
+    assert [len(f) for f in r] == [10, 6, 11]
+    assert np.allclose(x, x_.real)
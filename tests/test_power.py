@@ -1,5 +1,6 @@
 import numpy as np
 import os
+import pytest
 import inspect
 import sys
 
@@ -70,3 +71,86 @@ def test_power3d():
 
     print(p / (1.0 * k ** -2.))
     assert np.allclose(p, 1.0 * k ** -2., rtol=2)
+
+
+def test_power_hermitian_half():
+    # The auto-power uses a real FFT unless the variance is requested, which should give the same answer.
+    for N, dim in [(80, 2), (81, 2), (20, 3)]:
+        pb = PowerBox(N, dim=dim, pk=lambda k: 1.0 * k ** -2., boxlength=1.0, b=1)
+        delta = pb.delta_x()
+        for log_bins in [False, True]:
+            p, k = get_power(delta, pb.boxlength, b=1, log_bins=log_bins)
+            p2, k2, var = get_power(delta, pb.boxlength, b=1, log_bins=log_bins, get_variance=True)
+
+            assert np.allclose(p, p2, equal_nan=True)
+            assert np.allclose(k, k2, equal_nan=True)
+
+
+def test_cross_power_hermitian_half():
+    pb = PowerBox(50, dim=2, pk=lambda k: 1.0 * k ** -2., boxlength=1.0, b=1)
+    delta = pb.delta_x()
+    delta2 = delta + np.random.normal(size=delta.shape)
+
+    p, k = get_power(delta, pb.boxlength, deltax2=delta2, b=1)
+    p2, k2, var = get_power(delta, pb.boxlength, deltax2=delta2, b=1, get_variance=True)
+    assert np.allclose(p, p2)
+    assert np.allclose(k, k2)
+
+    # The cross-power of a field with itself is its auto-power.
+    assert np.allclose(get_power(delta, pb.boxlength, deltax2=delta, b=1)[0], get_power(delta, pb.boxlength, b=1)[0])
+
+
+def test_power_bin_cache():
+    pb = PowerBox(50, dim=3, pk=lambda k: 1.0 * k ** -2., boxlength=1.0, b=1)
+    cache = {}
+
+    p, k = get_power(pb.delta_x(), pb.boxlength, b=1, bin_cache=cache)
+    n = len(cache)
+    delta = pb.delta_x()
+    p2, k2 = get_power(delta, pb.boxlength, b=1, bin_cache=cache)
+    assert len(cache) == n
+
+    p3, k3 = get_power(delta, pb.boxlength, b=1)
+    assert np.allclose(p2, p3)
+    assert np.allclose(k2, k3)
+
+
+def test_power_hermitian_weights_broadcast():
+    # The weights of the half-space of modes are broadcast from the last axis, not stored for every mode.
+    cache = {}
+    delta = np.random.normal(size=(20, 20, 20))
+    p, k = get_power(delta, 1.0, bin_cache=cache)
+
+    weights = [v for key, v in cache.items() if key[0] == "hermitian"][0]
+    assert weights.shape == (20, 20, 11)
+    assert weights.strides[:-1] == (0, 0)
+
+
+def test_power_single_precision():
+    # Without pyFFTW, dtype is ignored.
+    pytest.importorskip("pyfftw")
+    from powerbox import dft
+    from powerbox.tools import _as_precision
+
+    pb = PowerBox(50, dim=3, pk=lambda k: 1.0 * k ** -2., boxlength=1.0, b=1)
+    delta = pb.delta_x()
+    assert dft.rfft(_as_precision(delta, np.float32), L=pb.boxlength)[0].dtype == np.complex64
+
+    p, k = get_power(delta, pb.boxlength, b=1)
+    p32, k32 = get_power(delta, pb.boxlength, b=1, dtype=np.float32)
+    assert np.allclose(p, p32, rtol=1e-4)
+    assert np.allclose(k, k32)
+
+
+def test_power_single_precision_complex():
+    pytest.importorskip("pyfftw")
+    from powerbox import dft
+    from powerbox.tools import _as_precision
+
+    delta = np.random.normal(size=(30, 30, 30)) + 1j * np.random.normal(size=(30, 30, 30))
+    assert dft.fft(_as_precision(delta, np.float32), L=1.0)[0].dtype == np.complex64
+
+    p, k = get_power(delta, 1.0)
+    p32, k32 = get_power(delta, 1.0, dtype=np.float32)
+    assert np.allclose(p, p32, rtol=1e-4)
+    assert np.allclose(k, k32)
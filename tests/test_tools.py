@@ -1,5 +1,6 @@
 import numpy as np
-from powerbox.tools import angular_average_nd, angular_average
+from powerbox.tools import angular_average_nd, angular_average, _bin_sums, _magnitude_grid, _digitize, _coords_range, _histogram, _cross_power, \
+    _getbins, _axes_digitize_coords
 import pytest
 
 def test_angular_avg_nd_3():
@@ -130,3 +131,172 @@ def test_against_multirealisation():
     print(var)
     print(var2)
     assert(np.all(np.isclose(var, var2, 1e-2)))
+
+
+def test_bin_sums_against_bincount():
+    x = np.linspace(-3, 3, 100)
+    X, Y = np.meshgrid(x, x)
+    r = np.sqrt(X ** 2 + Y ** 2)
+    P = np.random.normal(size=r.shape) + 1j * np.random.normal(size=r.shape)
+    w = np.random.uniform(size=r.shape)
+
+    indx = np.digitize(r.flatten(), np.linspace(0, 3, 15))
+    sum_w, sum_w2, sum_wc, sum_wf = _bin_sums(indx, 16, P, w, r)
+
+    assert np.allclose(sum_w, np.bincount(indx, weights=w.flatten(), minlength=16)[1:-1])
+    assert np.allclose(sum_w2, np.bincount(indx, weights=w.flatten() ** 2, minlength=16)[1:-1])
+    assert np.allclose(sum_wc, np.bincount(indx, weights=(w * r).flatten(), minlength=16)[1:-1])
+    assert np.allclose(sum_wf.real, np.bincount(indx, weights=(w * P.real).flatten(), minlength=16)[1:-1])
+    assert np.allclose(sum_wf.imag, np.bincount(indx, weights=(w * P.imag).flatten(), minlength=16)[1:-1])
+
+
+def test_angular_avg_nd_columns_match_angular_average():
+    x = np.linspace(-3, 3, 100)
+    P = np.random.normal(size=(100, 100, 5))
+    w = np.random.uniform(size=(100, 100))
+
+    p_k, k_av_bins, var = angular_average_nd(P, [x, x, np.arange(5.)], bins=20, n=2, weights=w, get_variance=True)
+
+    for i in range(5):
+        ave, coord, v = angular_average(P[:, :, i], [x, x], bins=20, weights=w, get_variance=True)
+        assert np.allclose(ave, p_k[:, i])
+        assert np.allclose(v, var[:, i])
+        assert np.allclose(coord, k_av_bins)
+
+
+def test_magnitude_grid_ordering():
+    x = np.linspace(-1, 1, 10)
+    y = np.linspace(-2, 2, 7)
+    grid = _magnitude_grid([x, y])
+
+    assert grid.shape == (10, 7)
+    assert np.allclose(grid, np.sqrt(np.add.outer(x ** 2, y ** 2)))
+
+
+def test_bin_cache():
+    x = np.linspace(-3, 3, 200)
+    X, Y = np.meshgrid(x, x)
+    r = np.sqrt(X ** 2 + Y ** 2)
+    cache = {}
+
+    ave, coord = angular_average(r ** -1., r, bins=20, bin_cache=cache)
+    assert len(cache) == 1
+
+    ave2, coord2 = angular_average(r ** -1., r, bins=20, bin_cache=cache)
+    assert len(cache) == 1
+    assert np.allclose(ave, ave2)
+    assert np.allclose(coord, coord2)
+
+    angular_average(r ** -1., r, bins=20, log_bins=True, bin_cache=cache)
+    assert len(cache) == 2
+
+
+@pytest.mark.parametrize("log_bins", [False, True])
+def test_axes_coords_match_grid(log_bins):
+    x = np.linspace(-3, 3, 40)
+    y = np.linspace(-2, 2, 30)
+    z = np.linspace(0.1, 1, 20)
+    r = _magnitude_grid([x, y, z])
+    P = np.random.normal(size=r.shape)
+    weights = np.random.uniform(size=r.shape)
+
+    ave, coord, var = angular_average(P, [x, y, z], bins=15, weights=weights, log_bins=log_bins, get_variance=True)
+    ave2, coord2, var2 = angular_average(P, r, bins=15, weights=weights, log_bins=log_bins, get_variance=True)
+
+    assert np.allclose(ave, ave2, equal_nan=True)
+    assert np.allclose(coord, coord2, equal_nan=True)
+    assert np.allclose(var, var2, equal_nan=True)
+
+
+@pytest.mark.parametrize("bins", [np.array([3., 2, 1, 0.5]), np.linspace(3, 0.5, 6)])
+def test_axes_coords_decreasing_bins(bins):
+    x = np.linspace(-2, 2, 30)
+    r = _magnitude_grid([x, x])
+    P = np.random.normal(size=r.shape)
+
+    ave, coord = angular_average(P, [x, x], bins=bins)
+    ave2, coord2 = angular_average(P, r, bins=bins)
+
+    assert not np.any(np.isnan(ave))
+    assert np.allclose(ave, ave2)
+    assert np.allclose(coord, coord2)
+
+
+def test_axes_coords_non_monotonic_bins():
+    x = np.linspace(-2, 2, 30)
+    with pytest.raises(ValueError):
+        angular_average(np.ones((30, 30)), [x, x], bins=np.array([0., 2, 1, 3]))
+
+
+@pytest.mark.parametrize("log_bins", [False, True])
+@pytest.mark.parametrize("L", [(1., 1., 1.), (1., 2., 1.)])
+def test_wavemode_binning(log_bins, L):
+    pytest.importorskip("numba")
+    from powerbox.dft import fftfreq
+    coords = [fftfreq(n, d=l / n) for n, l in zip((20, 16, 15), L)]
+    r = _magnitude_grid(coords).ravel()
+
+    # Include bins with edges which fall exactly on wavemodes.
+    for bins in [15, np.arange(0, 60, 2 * np.pi)]:
+        if log_bins and np.iterable(bins):
+            bins = bins[1:]
+        bins = _getbins(bins, coords, log_bins)
+        assert np.all(_axes_digitize_coords(coords, bins, log_bins) == np.digitize(r, bins))
+
+
+@pytest.mark.parametrize("log_bins", [False, True])
+def test_digitize(log_bins):
+    x = np.concatenate((np.random.uniform(0, 10, size=1000), np.linspace(0, 10, 101), [np.nan, -1., 20.]))
+    bins = np.logspace(-1, 1, 21) if log_bins else np.linspace(0, 10, 21)
+
+    assert np.all(_digitize(x, bins, log_bins) == np.digitize(x, bins))
+
+
+def test_float32_field():
+    x = np.linspace(-3, 3, 200)
+    X, Y = np.meshgrid(x, x)
+    r = np.sqrt(X ** 2 + Y ** 2)
+    P = np.random.normal(size=r.shape)
+
+    ave, coord, var = angular_average(P, r, bins=20, get_variance=True)
+    ave32, coord32, var32 = angular_average(P.astype(np.float32), r, bins=20, get_variance=True)
+
+    assert np.allclose(ave, ave32, rtol=1e-5, atol=1e-6)
+    assert np.allclose(var, var32, rtol=1e-5)
+
+
+@pytest.mark.parametrize("log", [False, True])
+def test_coords_range(log):
+    x = np.linspace(-3, 3, 101)
+    y = np.linspace(0.5, 2, 20)
+
+    for coords in ([x, x], [x, y], [y, y, x]):
+        assert np.all(_coords_range(coords, log) == _coords_range(_magnitude_grid(coords), log))
+
+
+def test_histogram():
+    edges = [np.linspace(0, 10, 21), np.linspace(0, 5, 8), np.linspace(0, 1, 4)]
+    pos = np.random.uniform(-1, 11, size=(5000, 3)) * np.array([1, 0.5, 0.1])
+    pos[:10] = np.array([10, 5, 1])  # upper edges are included in the last cell
+    pos[10:20, 0] = edges[0][7]
+    w = np.random.uniform(size=5000)
+
+    assert np.all(_histogram(pos, edges) == np.histogramdd(pos, bins=edges)[0])
+    assert np.allclose(_histogram(pos, edges, w), np.histogramdd(pos, bins=edges, weights=w)[0])
+    assert _histogram(pos, edges).dtype == np.float64
+
+
+def test_histogram_periodic():
+    edges = [np.linspace(0, 10, 21), np.linspace(0, 5, 8)]
+    pos = np.random.uniform(-20, 20, size=(5000, 2))
+    pos[:10] = -1e-20  # wraps onto the upper edge
+
+    assert np.all(_histogram(pos, edges, period=[10, 5]) == np.histogramdd(pos % [10, 5], bins=edges)[0])
+
+
+def test_cross_power():
+    FT = np.random.normal(size=(20, 30)) + 1j * np.random.normal(size=(20, 30))
+    FT2 = np.random.normal(size=(20, 30)) + 1j * np.random.normal(size=(20, 30))
+
+    assert np.allclose(_cross_power(FT, scale=0.5), 0.5 * np.abs(FT) ** 2)
+    assert np.allclose(_cross_power(FT, FT2, 0.5), 0.5 * np.real(FT * np.conj(FT2)))